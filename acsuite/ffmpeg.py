@@ -4,14 +4,27 @@ import string
 import tempfile
 
 from enum import Enum
-from shutil import which, move
+from functools import lru_cache
+from shutil import which
 from subprocess import CalledProcessError, run
-from typing import Any, Dict, List, Literal, Optional, NamedTuple, Tuple, Union
+from typing import Any, Callable, Dict, FrozenSet, List, Literal, Optional, NamedTuple, Tuple, Union
 
 from .log import logger
 
 
 FFMPEG_CODEC_HEADER_LEN: int = 10
+# PCM encoder Matroska can hold for each bit depth, 8-bit PCM is unsigned and 64-bit only exists as float
+PCM_ENCODERS: Dict[int, str] = {8: "pcm_u8", 16: "pcm_s16le", 24: "pcm_s24le", 32: "pcm_s32le", 64: "pcm_f64le"}
+# lossless codecs Matroska can hold, encoding them again after a filtergraph leaves the samples untouched
+LOSSLESS_CODECS: FrozenSet[str] = frozenset({
+    "flac", "alac", "tta", "wavpack",
+    "pcm_u8", "pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_s16be", "pcm_s24be", "pcm_s32be", "pcm_f32le", "pcm_f64le",
+})
+# ffmpeg command lines are split to stay clear of the 32767 character limit on Windows
+MAX_COMMAND_LENGTH: int = 24000
+# seconds as ffmpeg durations, str() switches to scientific notation which ffmpeg can't parse
+# timecodes are rounded to nanoseconds, so 9 digits lose nothing
+format_seconds: Callable[[float], str] = "{:.9f}".format
 
 
 class StreamType(Enum):
@@ -40,6 +53,77 @@ class AudioStream(NamedTuple):
     codec: Optional[Codec]
     depth: Optional[int]
     stream_index: int
+    # ffmpeg -disposition value, "0" if no flags are set
+    disposition: Optional[str] = None
+
+
+# parsed ``ffmpeg -codecs`` output, keyed by binary path and mtime
+_CODEC_CACHE: Dict[Tuple[str, int], Dict[str, Codec]] = {}
+
+
+@lru_cache(maxsize=8)
+def _find_binaries(search_path: Optional[str] = None, env_path: Optional[str] = None) -> Tuple[str, str]:
+    """Cached lookup of the ffmpeg and ffprobe binaries, ``env_path`` is the ``PATH`` to fall back on."""
+    ffmpeg = which("ffmpeg", path=search_path) or which("ffmpeg", path=env_path)
+    ffprobe = which("ffprobe", path=search_path) or which("ffprobe", path=env_path)
+
+    if ffmpeg is None or ffprobe is None:
+        raise FileNotFoundError(f"eztrim: ffmpeg/ffprobe executables not found in {search_path or 'PATH'}")
+
+    return ffmpeg, ffprobe
+
+
+def remove_if_exists(path: str) -> None:
+    """Remove a file if it exists, with a single unlink rather than a stat and an unlink."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def mka_outputs(output: Union[str, List[str]]) -> List[str]:
+    """Output filenames as a list, with ".mka" appended where missing."""
+    output = [output] if isinstance(output, str) else output
+    return [o if o.lower().endswith(".mka") else o + ".mka" for o in output]
+
+
+def output_names(output: Union[str, List[str]], count: int, filename: str = "", combine: bool = True) -> List[str]:
+    """
+    Resolve the output filenames for a number of streams.
+
+    :param output:   Output file. If multiple streams are supplied, must contain
+                     either the format specifier ``index`` or be a list, unless
+                     ``combine`` is True. May contain ``filename`` format specifier.
+                     If not present, ".mka" will be appended.
+    :param count:    Number of streams.
+    :param filename: Filename for output formatting.
+    :param combine:  Only use one output file (Default: True)
+
+    :return:         One filename if ``combine``, otherwise one for each stream.
+    """
+    output = mka_outputs(output)
+
+    if not combine:
+        if count > 1:
+            if len(output) > 1 and count != len(output):
+                raise ValueError("Improper number of output filenames supplied!")
+            if count != len(output) and \
+                    not any([name == "index" for _, name, _, _ in string.Formatter().parse(output[0])]):
+                raise ValueError("Output filename does not have an index format specifier!")
+            if len(output) == 1:
+                output = [output[0]] * count
+        return [o.format(filename=filename, index=i) for i, o in zip(range(count), output)]
+
+    if len(output) > 1:
+        raise ValueError("Received too many output filenames!")
+    if any([name == "index" for _, name, _, _ in string.Formatter().parse(output[0])]):
+        raise ValueError("Found an index format specifier in output filename, but 'combine' is True!")
+    return [output[0].format(filename=filename)]
+
+
+def clip_options(start: float, end: float) -> List[str]:
+    """ffmpeg output options to clip from ``start`` to ``end`` seconds."""
+    return ["-ss", format_seconds(start), "-to", format_seconds(end)]
 
 
 def get_temp_filename(prefix: str = "", suffix: str = "") -> str:
@@ -58,7 +142,13 @@ class FFmpeg():
     def get_codecs(self) -> None:
         """
         Query ffmpeg for supported codecs.
+
+        The result is reused for later instances with the same, unmodified binary.
         """
+        key = (self.ffmpeg_path, os.stat(self.ffmpeg_path).st_mtime_ns)
+        if key in _CODEC_CACHE:
+            self.codecs = dict(_CODEC_CACHE[key])
+            return
         ffout = self.ffmpeg("-codecs")
         for codec in ffout[FFMPEG_CODEC_HEADER_LEN:]:
             features = codec.split(" ")[1]
@@ -72,18 +162,20 @@ class FFmpeg():
                                       can_encode=features[1] == "E",
                                       stream_type=StreamType(features[2]),
                                       compression_type=compression)
+        _CODEC_CACHE[key] = dict(self.codecs)
 
-    def ffmpeg(self, *args: str) -> List[str]:
+    def ffmpeg(self, *args: str, stdin: Optional[str] = None) -> List[str]:
         """
         Run an ffmpeg command, text output.
 
-        :param args: ffmpeg arguments
+        :param args:  ffmpeg arguments
+        :param stdin: Text to feed to ffmpeg, readable as ``pipe:0`` (Default: None)
 
-        :return:     stdout of ffmpeg
+        :return:      stdout of ffmpeg
         """
         logger.debug("ffmpeg command args: {}".format(" ".join(list(args))))
-        return run([self.ffmpeg_path] + self.ffargs + list(args), capture_output=True, check=True, text=True) \
-            .stdout.splitlines()
+        return run([self.ffmpeg_path] + self.ffargs + list(args), input=stdin, capture_output=True, check=True,
+                   text=True).stdout.splitlines()
 
     def ffprobe_json(self, *args: str) -> Dict[str, Any]:
         """
@@ -103,14 +195,12 @@ class FFmpeg():
 
         :param search_path: Path to search for binaries.
         """
-        ffmpeg = which("ffmpeg", path=search_path) or which("ffmpeg")
-        ffprobe = which("ffprobe", path=search_path) or which("ffprobe")
-
-        if ffmpeg is None or ffprobe is None:
-            raise FileNotFoundError(f"eztrim: ffmpeg/ffprobe executables not found in {search_path or 'PATH'}")
-
-        self.ffmpeg_path = ffmpeg
-        self.ffprobe_path = ffprobe
+        env_path = os.environ.get("PATH")
+        self.ffmpeg_path, self.ffprobe_path = _find_binaries(search_path, env_path)
+        # a cached binary may have been removed since, look again instead of failing later
+        if not (os.path.isfile(self.ffmpeg_path) and os.path.isfile(self.ffprobe_path)):
+            _find_binaries.cache_clear()
+            self.ffmpeg_path, self.ffprobe_path = _find_binaries(search_path, env_path)
 
 
 class FFmpegAudio(FFmpeg):
@@ -138,7 +228,8 @@ class FFmpegAudio(FFmpeg):
             depth = s.get("bits_per_raw_sample", s.get("bits_per_sample", None))
             depth = int(depth) if int(depth) != 0 else None
             codec = self.codecs[s["codec_name"]] if s["codec_name"] in self.codecs else None
-            streams.append(AudioStream(codec=codec, stream_index=s["index"], depth=depth))
+            disposition = ("+".join(k for k, v in s["disposition"].items() if v) or "0") if "disposition" in s else None
+            streams.append(AudioStream(codec=codec, stream_index=s["index"], depth=depth, disposition=disposition))
         return streams if select is None else [streams[i] for i in select]
 
     def copy_or_decode(self, streams: List[AudioStream]) -> List[str]:
@@ -158,7 +249,7 @@ class FFmpegAudio(FFmpeg):
             if s.codec.can_encode:
                 ac += ["copy"]
             else:
-                best = f"pcm_s{s.depth}le" if s.depth in (8, 16, 24, 32, 64) else "pcm_s16le"
+                best = PCM_ENCODERS.get(s.depth or 16, "pcm_s16le")
                 # this warning will be annoying but whatever just silence it :^)
                 if s.codec.compression_type == CompressionType.LOSSY:
                     logger.warning(f"Lossy codec {s.codec.name} is unsupported for encoding! Will decode to {best}.")
@@ -172,8 +263,23 @@ class FFmpegAudio(FFmpeg):
         logger.debug("selected codecs: {}".format(" ".join(ac)))
         return ac
 
+    def filter_codecs(self, streams: List[AudioStream]) -> List[str]:
+        """
+        Decide the codec of each stream coming out of a filtergraph, where copying is impossible.
+
+        Streams in ``LOSSLESS_CODECS`` are encoded again with their own codec,
+        everything else is decided by ``copy_or_decode``.
+
+        :param streams: Audio streams to resolve.
+
+        :return: Codec for each stream.
+        """
+        return [s.codec.name if s.codec is not None and s.codec.can_encode and s.codec.name in LOSSLESS_CODECS else c
+                for s, c in zip(streams, self.copy_or_decode(streams)[1::2])]
+
     def map_streams(self, streams: List[AudioStream], output: Union[str, List[str]],
-                    filename: str = "", combine: bool = True) -> List[str]:
+                    filename: str = "", combine: bool = True, sources: Optional[List[str]] = None,
+                    codecs: Optional[List[str]] = None, options: Optional[List[str]] = None) -> List[str]:
         """
         Generate a set of ffmpeg map arguments for a given set of streams
         and a given set out output filenames.
@@ -186,37 +292,49 @@ class FFmpegAudio(FFmpeg):
                           If not present, ".mka" will be appended.
         :param filename:  Filename for outfile formatting.
         :param combine:   Only map to one output file (Default: True)
+        :param sources:   Input specifier to map for each stream, e.g. filtergraph labels.
+                          Streams mapped from labels get the tags and disposition of
+                          their source stream. (Default: ``0:{stream_index}`` of each stream)
+        :param codecs:    Codec for each stream, e.g. every other item from ``copy_or_decode``.
+                          Codec options only apply to the output that follows them, so they
+                          are repeated for each output. (Default: None, no codec arguments)
+        :param options:   Output options for every output file, e.g. ``-ss`` and ``-to``.
+                          Repeated for each output like the codecs. (Default: None)
         """
-        output = [output] if isinstance(output, str) else output
-        output = [o + ".mka" if not o.lower().endswith(".mka") else o for o in output]
+        sources = [f"0:{s.stream_index}" for s in streams] if sources is None else sources
+        names = output_names(output, len(streams), filename, combine)
 
         ffmap: List[str] = []
 
         if not combine:
-            if len(streams) > 1:
-                if len(output) > 1 and len(streams) != len(output):
-                    raise ValueError("Improper number of output filenames supplied!")
-                if len(streams) != len(output) and \
-                        not any([name == "index" for _, name, _, _ in string.Formatter().parse(output[0])]):
-                    raise ValueError("Output filename does not have an index format specifier!")
-                if len(output) == 1:
-                    output = [output[0]] * len(streams)
-            output = [o.format(filename=filename, index=i) for o, i in zip(output, streams)]
-            for o, s in zip(output, streams):
-                ffmap += ["-map", f"0:{s.stream_index}", o]
+            for i, (o, src) in enumerate(zip(names, sources)):
+                ffmap += options or []
+                ffmap += ["-map", src]
+                ffmap += self._stream_args(streams[i], src, None if codecs is None else codecs[i], 0)
+                ffmap += [o]
         else:
-            if len(output) > 1:
-                raise ValueError("Received too many output filenames!")
-            if any([name == "index" for _, name, _, _ in string.Formatter().parse(output[0])]):
-                raise ValueError("Found an index format specifier in output filename, but 'combine' is True!")
-            for s in streams:
-                ffmap += ["-map", f"0:{s.stream_index}"]
-            ffmap += [output[0].format(filename=filename)]
+            ffmap += options or []
+            for src in sources:
+                ffmap += ["-map", src]
+            for i, src in enumerate(sources):
+                ffmap += self._stream_args(streams[i], src, None if codecs is None else codecs[i], i)
+            ffmap += names
 
         logger.debug("ffmap: {}".format(" ".join(ffmap)))
         return ffmap
 
-    def clip_single(self, filename: str, start: float, end: float, streams: List[AudioStream]) -> str:
+    @staticmethod
+    def _stream_args(stream: AudioStream, source: str, codec: Optional[str], index: int) -> List[str]:
+        """Output options for the ``index``-th audio stream of an output file, mapped from ``source``."""
+        args = [f"-c:a:{index}", codec] if codec is not None else []
+        # filtergraph outputs don't inherit the tags (language, title) or disposition of the source stream
+        if source.startswith("["):
+            args += [f"-map_metadata:s:a:{index}", f"0:s:{stream.stream_index}"]
+            args += [f"-disposition:a:{index}", stream.disposition] if stream.disposition is not None else []
+        return args
+
+    def clip_single(self, filename: str, start: float, end: float, streams: List[AudioStream],
+                    ffmap: Optional[List[str]] = None) -> str:
         """
         Clip a single audio segment from a file.
 
@@ -224,47 +342,138 @@ class FFmpegAudio(FFmpeg):
         :param start:    Start time
         :param end:      End time
         :param streams:  Streams to clip
+        :param ffmap:    Output arguments from ``map_streams``, including codecs and
+                         ``clip_options(start, end)`` as options, which every output needs.
+                         (Default: None, clip to a tempfile)
 
-        :return:         Tempfile path containing clipped audio.
+        :return:         Tempfile path containing clipped audio, empty if ``ffmap`` was given.
         """
         if start >= end or start < 0:
             raise ValueError("Invalid clip range")
-        out = get_temp_filename(prefix="_acsuite_temp_", suffix=".mka")
+        out = get_temp_filename(prefix="_acsuite_temp_", suffix=".mka") if ffmap is None else ""
+        if ffmap is None:
+            ffmap = self.map_streams(streams, out, codecs=self.copy_or_decode(streams)[1::2],
+                                     options=clip_options(start, end))
         try:
+            self.ffmpeg("-i", filename, *ffmap, "-y")
+        except CalledProcessError:
+            remove_if_exists(out)
+            raise ValueError(f"Could not clip \"{filename}\"! Does it exist and is it a media container?") from None
+        return out
+
+    def clip_multiple(self, filename: str, ranges: List[Tuple[float, float]], streams: List[AudioStream],
+                      outputs: Optional[List[str]] = None) -> List[str]:
+        """
+        Clip several audio segments from a file with a single ffmpeg process.
+
+        Every segment is a separate output of the same invocation, so the file is
+        opened and demuxed once instead of once per segment. Long range lists are
+        split over as few invocations as the command line length allows.
+
+        :param filename: File to clip
+        :param ranges:   Ranges to clip
+        :param streams:  Streams to clip
+        :param outputs:  Output file for each range. (Default: None, clip to tempfiles)
+
+        :return:         Paths containing the clipped audio, in the order of ``ranges``.
+        """
+        if any(start >= end or start < 0 for start, end in ranges):
+            raise ValueError("Invalid clip range")
+        if outputs is None:
+            outputs = [get_temp_filename(prefix="_acsuite_temp_", suffix=".mka") for _ in ranges]
+        elif len(outputs) != len(ranges):
+            raise ValueError("Improper number of output filenames supplied!")
+        codecs = self.copy_or_decode(streams)[1::2]
+        batches: List[List[str]] = [[]]
+        length = 0
+        for (start, end), out in zip(ranges, outputs):
+            group = self.map_streams(streams, out, codecs=codecs, options=clip_options(start, end))
+            group_length = sum(len(a) + 1 for a in group)
+            if batches[-1] and length + group_length > MAX_COMMAND_LENGTH - len(filename):
+                batches.append([])
+                length = 0
+            batches[-1] += group
+            length += group_length
+        try:
+            for args in batches:
+                self.ffmpeg("-i", filename, *args, "-y")
+        except CalledProcessError:
+            for out in outputs:
+                remove_if_exists(out)
+            raise ValueError(f"Could not clip \"{filename}\"! Does it exist and is it a media container?") from None
+        return outputs
+
+    def clip_filtered(self, filename: str, ranges: List[Tuple[float, float]], streams: List[AudioStream],
+                      ffmap: Optional[List[str]] = None) -> str:
+        """
+        Clip and join audio segments from a file in a single pass.
+
+        Every stream is decoded, trimmed with ``atrim`` and joined with ``concat``
+        inside one filtergraph, so the file is only read once and no per-segment
+        files are written. Only usable if every stream is either decoded anyway
+        or in ``LOSSLESS_CODECS``, see ``filter_codecs``. Ranges should be ascending
+        and not overlap, ``concat`` buffers everything decoded ahead of the range it is on.
+
+        :param filename: File to clip
+        :param ranges:   Ranges to trim and append.
+        :param streams:  Streams to clip
+        :param ffmap:    Output arguments from ``map_streams``, including codecs and using
+                         ``[a{i}]`` as the source of the i-th stream. (Default: None, clip to a tempfile)
+
+        :return:         Tempfile path containing clipped audio, empty if ``ffmap`` was given.
+        """
+        if any(start >= end or start < 0 for start, end in ranges):
+            raise ValueError("Invalid clip range")
+        graph: List[str] = []
+        for i, s in enumerate(streams):
+            graph += [f"[0:{s.stream_index}]asplit={len(ranges)}"
+                      + "".join(f"[s{i}_{k}]" for k in range(len(ranges)))]
+            graph += [f"[s{i}_{k}]atrim=start={format_seconds(start)}:end={format_seconds(end)},"
+                      f"asetpts=PTS-STARTPTS[t{i}_{k}]" for k, (start, end) in enumerate(ranges)]
+            graph += ["".join(f"[t{i}_{k}]" for k in range(len(ranges))) + f"concat=n={len(ranges)}:v=0:a=1[a{i}]"]
+        out = get_temp_filename(prefix="_acsuite_temp_", suffix=".mka") if ffmap is None else ""
+        if ffmap is None:
+            ffmap = self.map_streams(streams, out, sources=[f"[a{i}]" for i in range(len(streams))],
+                                     codecs=self.filter_codecs(streams))
+        try:
+            # the graph grows with every range and stream, so it is piped in instead of passed as an argument
+            # chapters would be copied at their untrimmed times, nothing in the output matches them
             self.ffmpeg("-i", filename,
-                        "-ss", str(start),
-                        "-to", str(end),
-                        *self.copy_or_decode(streams),
-                        *self.map_streams(streams, out), "-y")
+                        "-filter_complex_script", "pipe:0",
+                        "-map_chapters", "-1",
+                        *ffmap, "-y",
+                        stdin=";".join(graph))
         except CalledProcessError:
-            os.remove(out) if os.path.isfile(out) else None
+            remove_if_exists(out)
             raise ValueError(f"Could not clip \"{filename}\"! Does it exist and is it a media container?") from None
         return out
 
-    def concat(self, *files: str) -> str:
+    def concat(self, *files: str, ffmap: Optional[List[str]] = None) -> str:
         """
         Concatenate files.
 
         :param files: Files to concatenate.
+        :param ffmap: Output arguments from ``map_streams``, including codecs.
+                      (Default: None, stream copy to a tempfile)
 
-        :return:      Tempfile path containing concatenated audio.
+        :return:      Tempfile path containing concatenated audio, empty if ``ffmap`` was given.
         """
-        cf = get_temp_filename(prefix="_acsuite_temp_", suffix=".txt")
-        out = get_temp_filename(prefix="_acsuite_temp_", suffix=".mka")
-        with open(cf, "w") as cfo:
-            for f in files:
-                f = f.replace("'", "'\\''")
-                cfo.write(f"file '{f}'\n")
+        out = get_temp_filename(prefix="_acsuite_temp_", suffix=".mka") if ffmap is None else ""
+        # the listing is piped in, entries would resolve relative to "pipe:" unless given as absolute file: urls
+        listing = ""
+        for f in files:
+            f = os.path.abspath(f).replace("'", "'\\''")
+            listing += f"file 'file:{f}'\n"
         try:
             self.ffmpeg("-f", "concat",
-                        "-i", cf,
-                        "-c", "copy",
-                        out, "-y")
+                        "-safe", "0",
+                        "-protocol_whitelist", "file,pipe",
+                        "-i", "pipe:0",
+                        *(["-c", "copy", out] if ffmap is None else ffmap), "-y",
+                        stdin=listing)
         except CalledProcessError:
-            os.remove(cf)
-            os.remove(out) if os.path.isfile(out) else None
+            remove_if_exists(out)
             raise ValueError("Could not concatenate!") from None
-        os.remove(cf)
         return out
 
     def split(self, filename: str, outfile: Union[str, List[str]]) -> None:
@@ -279,9 +488,8 @@ class FFmpegAudio(FFmpeg):
         """
         streams = self.get_audio_streams(filename)
         self.ffmpeg("-i", filename,
-                    "-c", "copy",
                     "-vn", "-sn",
-                    *self.map_streams(streams, outfile, filename, combine=False),
+                    *self.map_streams(streams, outfile, filename, combine=False, codecs=["copy"] * len(streams)),
                     "-y"
                     )
 
@@ -318,34 +526,54 @@ class FFmpegAudio(FFmpeg):
                           (Default: "{filename}_ATrim.mka")
         :param combine:   Output all trimmed streams into a single file. (Default: True)
         """
-        outfile = [outfile] if isinstance(outfile, str) else outfile
-        outfile = [o + ".mka" if not o.lower().endswith(".mka") else o for o in outfile]
-        partials: List[str] = []
+        # a single stream always ends up in a single file
+        combine = combine or len(streams) == 1
+        # if every stream is decoded anyway or losslessly encoded again, trim and join in one pass,
+        # concat reads its inputs in order, so later ranges coming first would pile up in memory
+        single_pass = all(s.codec is not None and (not s.codec.can_encode or s.codec.name in LOSSLESS_CODECS)
+                          for s in streams) and all(a[1] <= b[0] for a, b in zip(ranges, ranges[1:]))
+        # the final pass writes straight to the output files, so there is
+        # no intermediate file to move or split afterwards
+        sources: Optional[List[str]] = None
+        if single_pass:
+            sources = [f"[a{i}]" for i in range(len(streams))]
+        elif len(ranges) > 1:
+            # clips only contain the selected streams, in order
+            sources = [f"0:{i}" for i in range(len(streams))]
+        if single_pass:
+            codecs = self.filter_codecs(streams)
+        elif len(ranges) == 1:
+            codecs = self.copy_or_decode(streams)[1::2]
+        else:
+            # clips are already in their final codecs
+            codecs = ["copy"] * len(streams)
+        names = output_names(outfile, len(streams), filename, combine)
+        # the final pass writes next to the outputs and is only moved over them once it
+        # succeeds, a failed run must not truncate or leave behind partial outputs
+        finals = [os.path.join(os.path.dirname(os.path.abspath(n)), get_temp_filename("_acsuite_temp_", ".mka"))
+                  for n in names]
+        # escaped, map_streams formats them like any other output name
+        # a single range is clipped straight to the outputs, ffmpeg resets -ss/-to for every output
+        options = clip_options(*ranges[0]) if not single_pass and len(ranges) == 1 else None
+        ffmap = self.map_streams(streams, [f.replace("{", "{{").replace("}", "}}") for f in finals],
+                                 filename, combine, sources, codecs, options)
 
         try:
-            # generate clips
-            # can't use a list comprehension here otherwise we'll lose the
-            # entire list for cleanup
-            for r in ranges:
-                partials.append(self.clip_single(filename, r[0], r[1], streams))
-
-            # concatenate, if necessary
-            clipped = self.concat(*partials) if len(ranges) > 1 else partials[0]
-
-            # split and rename
-            if not combine and len(streams) > 1:
-                self.split(clipped, outfile)
-                if len(outfile) != len(streams):
-                    outfile = [outfile[0]] * len(streams)
+            if single_pass:
+                self.clip_filtered(filename, ranges, streams, ffmap)
+            elif len(ranges) == 1:
+                self.clip_single(filename, ranges[0][0], ranges[0][1], streams, ffmap)
             else:
-                if len(outfile) > 1:
-                    raise ValueError("Received too many output filenames!")
-                if any([name == "index" for _, name, _, _ in string.Formatter().parse(outfile[0])]):
-                    raise ValueError("Found an index format specifier in output filename, but 'combine' is True!")
-                move(clipped, outfile[0].format(filename=filename))
+                # private to this call and removed even on errors, kept next to the
+                # output since it needs about as much space
+                with tempfile.TemporaryDirectory(prefix="_acsuite_temp_",
+                                                 dir=os.path.dirname(finals[0])) as tempdir:
+                    partials = [os.path.join(tempdir, f"{k}.mka") for k in range(len(ranges))]
+                    self.concat(*self.clip_multiple(filename, ranges, streams, partials), ffmap=ffmap)
+            for f, n in zip(finals, names):
+                os.replace(f, n)
         finally:
-            for p in partials:
-                os.remove(p) if os.path.isfile(p) else None
-            os.remove(clipped) if os.path.isfile(clipped) else None
+            for f in finals:
+                remove_if_exists(f)
 
-        return [o.format(filename=filename, index=i) for o, i in zip(outfile, streams)]
+        return names
@@ -0,0 +1,115 @@
+import os
+
+from bisect import bisect_right
+from contextlib import ExitStack
+from typing import Any, Dict, List, Tuple, Union
+
+from .ffmpeg import get_temp_filename, output_names, remove_if_exists
+from .log import logger
+
+
+def recut(filename: str, ranges: List[Tuple[float, float]], streams: Union[int, List[int], None] = None,
+          outfile: Union[str, List[str]] = "{filename}_ATrim.mka", combine: bool = True) -> List[str]:
+    """
+    Recut audio from a multimedia container in-process with PyAV.
+
+    Packets are copied as-is, like ``-c copy``, without any ffmpeg processes or
+    intermediate files. Ascending, non-overlapping ranges are cut in a single
+    demuxing pass, every range that goes backwards starts another pass.
+    Cuts land on packet boundaries, every range starts with the packet containing
+    its start and is joined right after the end of the previous one.
+
+    :param filename:  Container file to process.
+    :param ranges:    Ranges to trim and append.
+    :param streams:   Streams to trim. Zero-indexed, only considers audio streams.
+                      If ``None``, process all streams (Default: None).
+    :param outfile:   Output file. If multiple streams are selected, must contain
+                      either the format specifier ``index`` or be a list, unless
+                      ``combine`` is True. May contain ``filename`` format specifier.
+                      If not present, ".mka" will be appended.
+                      (Default: "{filename}_ATrim.mka")
+    :param combine:   Output all trimmed streams into a single file. (Default: True)
+
+    :return:          Output file names.
+    """
+    try:
+        import av
+    except ImportError:
+        raise ImportError("recut: the pyav backend needs PyAV, install it with 'pip install av>=13'") from None
+
+    if any(start >= end or start < 0 for start, end in ranges):
+        raise ValueError("Invalid clip range")
+
+    with av.open(filename) as src:
+        audio = list(src.streams.audio)
+        select = range(len(audio)) if streams is None else [streams] if isinstance(streams, int) else streams
+        selected = [audio[i] for i in select]
+        # a single stream always ends up in a single file
+        combine = combine or len(selected) == 1
+        names = output_names(outfile, len(selected), filename, combine)
+        groups = [selected] if combine else [[s] for s in selected]
+
+        # written next to the outputs and only moved over them once every container closed cleanly,
+        # a failed run must not truncate or leave behind partial outputs
+        finals = [os.path.join(os.path.dirname(os.path.abspath(n)), get_temp_filename("_acsuite_temp_", ".mka"))
+                  for n in names]
+        try:
+            with ExitStack() as outputs:
+                # input stream index -> (output container, output stream)
+                omap: Dict[int, Tuple[Any, Any]] = {}
+                for name, group in zip(finals, groups):
+                    container = outputs.enter_context(av.open(name, "w"))
+                    for s in group:
+                        omap[s.index] = (container, container.add_stream_from_template(s))
+
+                # split into runs of ascending ranges that can share a pass
+                runs: List[List[Tuple[float, float]]] = []
+                for r in ranges:
+                    if runs and r[0] >= runs[-1][-1][1]:
+                        runs[-1].append(r)
+                    else:
+                        runs.append([r])
+
+                # where each output stream ends so far, in the input stream's time base, every
+                # range continues exactly there so the output starts at 0 and has no gaps or overlaps
+                out_end = {s.index: 0 for s in selected}
+                for run in runs:
+                    ends = [end for _, end in run]
+                    # range each stream is currently copying and the shift applied to its packets
+                    current: Dict[int, Tuple[int, int]] = {}
+                    # seeking is only keyframe-accurate per stream, rewinding is exact
+                    src.seek(0)
+                    done = set()
+                    for packet in src.demux(selected):
+                        if packet.pts is None:
+                            continue
+                        index = packet.stream.index
+                        t = float(packet.pts * packet.time_base)
+                        if t >= run[-1][1]:
+                            done.add(index)
+                            if len(done) == len(selected):
+                                break
+                            continue
+                        # the first range not over yet, packets reaching into it are kept whole
+                        k = bisect_right(ends, t)
+                        duration = packet.duration or 0
+                        if t < run[k][0] and t + float(duration * packet.time_base) <= run[k][0]:
+                            continue
+                        if index not in current or current[index][0] != k:
+                            current[index] = (k, out_end[index] - packet.pts)
+                        shift = current[index][1]
+                        packet.pts += shift
+                        if packet.dts is not None:
+                            packet.dts += shift
+                        out_end[index] = max(out_end[index], packet.pts + duration)
+                        container, ostream = omap[index]
+                        packet.stream = ostream
+                        container.mux(packet)
+            for f, name in zip(finals, names):
+                os.replace(f, name)
+        finally:
+            for f in finals:
+                remove_if_exists(f)
+
+    logger.debug("pyav outputs: {}".format(" ".join(names)))
+    return names
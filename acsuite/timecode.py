@@ -1,13 +1,20 @@
+import mmap
+import os
 import vapoursynth as vs
 
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
 from fractions import Fraction
 from functools import lru_cache
-from typing import List, Optional, Union, Tuple, cast
+from math import gcd
+from typing import Iterator, List, Optional, Sequence, Union, Tuple, cast, overload
 
+from .log import logger
 from .types import Trim
 
 
-def get_timecodes(timecodes_file: Optional[str] = None, clip: Optional[vs.VideoNode] = None) -> List[float]:
+def get_timecodes(timecodes_file: Optional[str] = None, clip: Optional[vs.VideoNode] = None) -> Sequence[float]:
     """
     Get timecodes for every frame.
 
@@ -17,10 +24,10 @@ def get_timecodes(timecodes_file: Optional[str] = None, clip: Optional[vs.VideoN
     :param timecodes_file: Path to v2 timecodes plaintext file.
     :param clip:           Reference vapoursynth clip. If vfr, the timecodes will be calculated.
 
-    :return:               List of timecodes.
+    :return:               Sequence of timecodes. For cfr clips, timecodes are only computed when looked up.
     """
     if timecodes_file is not None:
-        return [float(x) / 1000 for x in open(timecodes_file, "r").read().splitlines()[1:]]
+        return _load_timecodes(timecodes_file, os.stat(timecodes_file).st_mtime_ns)
 
     if clip is None:
         raise ValueError("get_timecodes: need a clip or timecodes file")
@@ -28,11 +35,11 @@ def get_timecodes(timecodes_file: Optional[str] = None, clip: Optional[vs.VideoN
     if clip.fps == Fraction(0, 1):
         return clip_to_timecodes(clip)
 
-    return [round(float(1e9*f*(1/clip.fps)))/1e9 for f in range(0, clip.num_frames + 1)]
+    return _CFRTimecodes(clip.fps, clip.num_frames)
 
 
 def frames_to_timecodes(ranges: Union[Trim, List[Trim]],
-                        timecodes: List[float]) -> List[Tuple[float, float]]:
+                        timecodes: Sequence[float]) -> List[Tuple[float, float]]:
     """
     Convert a list of frame ranges to a list of timestamp ranges.
 
@@ -42,31 +49,121 @@ def frames_to_timecodes(ranges: Union[Trim, List[Trim]],
     :return:          List of timestamp ranges.
     """
     ranges = [ranges] if isinstance(ranges, tuple) else ranges
+    if not isinstance(ranges, list):
+        raise TypeError("frames_to_timecodes: trims must be a list of tuples or a single tuple")
     num_frames = len(timecodes) - 1
 
+    # most trim lists are already positive and ordered, those convert as they are
+    prev_end = 0
+    for r in ranges:
+        if not (isinstance(r, (tuple, list)) and len(r) == 2 and isinstance(r[0], int) and isinstance(r[1], int)
+                and prev_end <= r[0] < r[1] <= num_frames):
+            break
+        prev_end = r[1]
+    else:
+        return [(timecodes[start], timecodes[end]) for start, end in cast(List[Tuple[int, int]], ranges)]
+
+    # validation, normalization and conversion all happen in this one pass
     out = []
+    # frames covered by the trims so far, as sorted and disjoint [start, end) intervals
+    covered_starts: List[int] = []
+    covered_ends: List[int] = []
     for r in ranges:
+        # lists too, trims loaded from json are never tuples
+        if not isinstance(r, (tuple, list)):
+            raise TypeError(f"frames_to_timecodes: trim {r!r} is not a tuple or list")
+        if len(r) != 2:
+            raise ValueError(f"frames_to_timecodes: trim {r} must have 2 elements")
         start, end = r
+        if not (start is None or isinstance(start, int)) or not (end is None or isinstance(end, int)):
+            raise TypeError(f"frames_to_timecodes: trim {r} must contain only ints or None")
         start = 0 if start is None else start
         start = start + num_frames if start < 0 else start
         end = num_frames if end is None else end
         end = end + num_frames if end <= 0 else end
+        # negative indexing wraps around once, anything further is out of the clip
+        if start < 0 or end < 0 or end > num_frames:
+            raise ValueError(f"frames_to_timecodes: trim {r} is out of bounds for a {num_frames} frame clip")
         if start >= end:
             raise ValueError("frames_to_timecodes: start frame is later than end frame")
+        # trims don't have to be ordered, so check against everything covered so far
+        lo, hi = bisect_left(covered_ends, start), bisect_right(covered_starts, end)
+        if bisect_right(covered_ends, start) < bisect_left(covered_starts, end):
+            logger.warning(f"frames_to_timecodes: trim {r} overlaps an earlier trim, audio will be repeated")
+        # merged with every interval it overlaps or touches
+        covered_starts[lo:hi] = [min([start] + covered_starts[lo:hi])]
+        covered_ends[lo:hi] = [max([end] + covered_ends[lo:hi])]
         out.append((timecodes[start], timecodes[end]))
 
     return out
 
 
+@lru_cache(maxsize=4)
+def _load_timecodes(timecodes_file: str, mtime: int) -> Sequence[float]:
+    """Cached timecodes file loader, ``mtime`` is only part of the key so edited files get reloaded."""
+    with open(timecodes_file, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return array("d")
+        # mapped instead of read, lines are parsed straight out of the page cache into doubles
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mm.readline()  # skip the "# timecode format v2" header
+            return array("d", (float(x) / 1000 for x in iter(mm.readline, b"") if not x.isspace()))
+
+
+class _CFRTimecodes(Sequence[float]):
+    """
+    Timecodes for a constant frame rate clip.
+
+    Only the frames that are looked up get converted, so trimming a long clip
+    costs two conversions per trim instead of one for every frame.
+    """
+
+    def __init__(self, fps: Fraction, num_frames: int) -> None:
+        # plain ints, Fraction arithmetic reduces with a gcd on every operation
+        self.fps_num = fps.numerator
+        self.fps_den = fps.denominator
+        self.num_frames = num_frames
+
+    def __len__(self) -> int:
+        return self.num_frames + 1
+
+    @overload
+    def __getitem__(self, index: int) -> float: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[float]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[float, List[float]]:
+        if isinstance(index, slice):
+            return [self[f] for f in range(*index.indices(len(self)))]
+        f = index + len(self) if index < 0 else index
+        if not 0 <= f < len(self):
+            raise IndexError("timecode index out of range")
+        # nanoseconds, rounded half up
+        return (2 * 10**9 * f * self.fps_den + self.fps_num) // (2 * self.fps_num) / 1e9
+
+
+def _prefetch_frames(clip: vs.VideoNode) -> Iterator[vs.VideoFrame]:
+    """Yield every frame of ``clip`` in order, keeping ``core.num_threads`` requests in flight."""
+    ahead = max(1, vs.core.num_threads)
+    futures = deque([clip.get_frame_async(n) for n in range(min(ahead, clip.num_frames))])
+    for n in range(ahead, clip.num_frames):
+        frame = futures.popleft().result()
+        futures.append(clip.get_frame_async(n))
+        yield frame
+    while futures:
+        yield futures.popleft().result()
+
+
 @lru_cache
-def clip_to_timecodes(src_clip: vs.VideoNode) -> List[float]:
+def clip_to_timecodes(src_clip: vs.VideoNode) -> Sequence[float]:
     """
-    Cached function to return a list of timecodes for vfr clips.
+    Cached function to return an array of timecodes for vfr clips.
 
     The first call to this function can be `very` expensive depending on the `src_clip`
     length and the source filter used.
 
-    Subsequent calls on the same clip will return the previously generated list of timecodes.
+    Subsequent calls on the same clip will return the previously generated array of timecodes.
     The timecodes are `floats` representing seconds from the start of the `src_clip`.
 
     If you have ``rich`` installed, will output a pretty progress bar as this process can take a long time.
@@ -81,16 +178,26 @@ def clip_to_timecodes(src_clip: vs.VideoNode) -> List[float]:
 
         rich = False
 
-    timecodes = [0.0]
-    curr_time = Fraction()
-    for frame in track(src_clip.frames(), description="Finding timestamps...", total=src_clip.num_frames):
+    # preallocated doubles take 8 bytes per frame instead of a list of float objects
+    timecodes = array("d", bytes(8 * (src_clip.num_frames + 1)))
+    # exact running time as a plain fraction curr_num / curr_den
+    curr_num, curr_den = 0, 1
+    print_every = max(1, src_clip.num_frames // 100)
+    # requesting frames ahead lets the source filter decode on all threads
+    frames = track(_prefetch_frames(src_clip), description="Finding timestamps...", total=src_clip.num_frames)
+    for i, frame in enumerate(frames, start=1):
         num = cast(int, frame.props["_DurationNum"])
         den = cast(int, frame.props["_DurationDen"])
-        curr_time += Fraction(num, den)
-        timecodes.append(float(curr_time))
+        if den == curr_den:
+            curr_num += num
+        else:
+            curr_num, curr_den = curr_num * den + num * curr_den, curr_den * den
+            g = gcd(curr_num, curr_den)
+            curr_num, curr_den = curr_num // g, curr_den // g
+        timecodes[i] = curr_num / curr_den
         if rich:
             pass  # if ran in a normal console/terminal, should render a pretty progress bar
-        else:
-            print(f"Generating timecodes: {round(100 * len(timecodes) / src_clip.num_frames)}%", end="\r")
+        elif i % print_every == 0:
+            print(f"Generating timecodes: {round(100 * i / src_clip.num_frames)}%", end="\r")
     print("")
     return timecodes
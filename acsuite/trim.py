@@ -1,8 +1,11 @@
+import os
 import vapoursynth as vs
 
-from typing import List, Optional, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Literal, Optional, Tuple, Union
 
-from .ffmpeg import FFmpegAudio
+from . import pyav
+from .ffmpeg import AudioStream, FFmpegAudio
 from .timecode import frames_to_timecodes, get_timecodes
 from .types import Trim
 
@@ -18,6 +21,7 @@ def eztrim(
     *,
     ffmpeg_path: Optional[str] = None,
     timecodes_file: Optional[str] = None,
+    backend: Literal["ffmpeg", "pyav"] = "ffmpeg",
 ) -> List[str]:
     """
     Simple trimming function that follows VapourSynth/Python slicing syntax.
@@ -68,11 +72,25 @@ def eztrim(
     :param timecodes_file: Timecodes v2 file (generated by vspipe, ffms2, etc.) for variable-frame-rate clips.
                            Not needed for CFR clips.
 
+    :param backend:     ``"ffmpeg"`` runs the ffmpeg executable. ``"pyav"`` copies packets in-process
+                        with PyAV (``pip install av>=13``), without spawning any processes. (Default: "ffmpeg")
+
     :return: Returns output file names as strings.
     """
-    trims = [trims] if isinstance(trims, tuple) else trims
-    timecodes = get_timecodes(timecodes_file, ref_clip or vs.core.ffms2.Source(src))
-    ranges = frames_to_timecodes(trims, timecodes)
-    ffmpeg = FFmpegAudio(ffmpeg_path)
-    selected = ffmpeg.get_audio_streams(src, streams)
+    def probe() -> Tuple[FFmpegAudio, List[AudioStream]]:
+        ffmpeg = FFmpegAudio(ffmpeg_path)
+        return ffmpeg, ffmpeg.get_audio_streams(src, streams)
+
+    if backend not in ("ffmpeg", "pyav"):
+        raise ValueError(f"eztrim: unknown backend \"{backend}\"")
+    # raises FileNotFoundError up front instead of an ffms2 or ffprobe failure
+    os.stat(src)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # probing only waits on ffmpeg/ffprobe, so let it run while the timecodes are generated
+        probed = executor.submit(probe) if backend == "ffmpeg" else None
+        timecodes = get_timecodes(timecodes_file, ref_clip or vs.core.ffms2.Source(src))
+        ranges = frames_to_timecodes(trims, timecodes)
+        if probed is None:
+            return pyav.recut(src, ranges, streams, outfile, combine)
+        ffmpeg, selected = probed.result()
     return ffmpeg.recut(src, ranges, selected, outfile, combine)
@@ -1,4 +1,5 @@
 import os
+import re
 import shutil
 import unittest
 from fractions import Fraction
@@ -15,6 +16,9 @@ class ACsuiteTests(unittest.TestCase):
     VFR_CLIP = core.std.BlankClip(fpsnum=24000, fpsden=1001, length=24000) + core.std.BlankClip(
         fpsnum=30000, fpsden=1001, length=30000
     )
+    FLAC = acsuite.Codec(acsuite.StreamType.AUDIO, acsuite.CompressionType.LOSSLESS, "flac", True, True)
+    AAC = acsuite.Codec(acsuite.StreamType.AUDIO, acsuite.CompressionType.LOSSY, "aac", True, True)
+    TRUEHD = acsuite.Codec(acsuite.StreamType.AUDIO, acsuite.CompressionType.LOSSLESS, "truehd", True, False)
 
     def test_default_clip(self):
         self.assertEqual(self.BLANK_CLIP.num_frames, 100)
@@ -71,6 +75,190 @@ class ACsuiteTests(unittest.TestCase):
         self.assertEqual(acsuite.f2ts(10000, src_clip=self.VFR_CLIP), "00:06:57.083")
         self.assertEqual(acsuite.f2ts(25000, src_clip=self.VFR_CLIP), "00:17:14.367")
 
+    def test_get_timecodes_cfr(self):
+        timecodes = acsuite.get_timecodes(clip=self.BLANK_CLIP)
+        self.assertEqual(len(timecodes), self.BLANK_CLIP.num_frames + 1)
+        self.assertEqual(timecodes[0], 0.0)
+        self.assertEqual(timecodes[69], 13.8)
+        self.assertEqual(timecodes[-1], 20.0)
+        self.assertEqual(timecodes[1:3], [0.2, 0.4])
+        with self.assertRaises(IndexError):
+            timecodes[101]
+
+    def test_get_timecodes_file(self):
+        with open("_acsuite_test_timecodes.txt", "w") as f:
+            f.write("# timecode format v2\n0\n40\n80\n")
+        try:
+            self.assertEqual(list(acsuite.get_timecodes("_acsuite_test_timecodes.txt")), [0.0, 0.04, 0.08])
+        finally:
+            os.remove("_acsuite_test_timecodes.txt")
+
+    def test_frames_to_timecodes(self):
+        timecodes = acsuite.get_timecodes(clip=self.BLANK_CLIP)
+        self.assertEqual(acsuite.frames_to_timecodes((None, None), timecodes), [(0.0, 20.0)])
+        self.assertEqual(acsuite.frames_to_timecodes([(-90, -20), (0, -10)], timecodes), [(2.0, 16.0), (0.0, 18.0)])
+        self.assertEqual(acsuite.frames_to_timecodes([[-90, -20], [0, -10]], timecodes), [(2.0, 16.0), (0.0, 18.0)])
+
+        # positive ordered trims skip normalization, the result has to match the validating pass
+        ordered = acsuite.frames_to_timecodes([(0, 10), (20, 30), (40, 100)], timecodes)
+        self.assertEqual(ordered, [(0.0, 2.0), (4.0, 6.0), (8.0, 20.0)])
+        self.assertEqual(acsuite.frames_to_timecodes([(None, 10), (20, 30), (40, None)], timecodes), ordered)
+        self.assertEqual(acsuite.frames_to_timecodes([[0, 10], [20, 30], [40, 100]], timecodes), ordered)
+        # only the last trim sends these back to the validating pass
+        self.assertEqual(acsuite.frames_to_timecodes([(0, 10), (20, 30), (40, None)], timecodes), ordered)
+        self.assertEqual(acsuite.frames_to_timecodes([(0, 10), (20, 30), (-60, -0)], timecodes), ordered)
+        with self.assertRaisesRegex(ValueError, "bounds"):
+            acsuite.frames_to_timecodes([(0, 10), (20, 30), (40, 101)], timecodes)
+
+        with self.assertRaisesRegex(ValueError, "bounds"):
+            acsuite.frames_to_timecodes((None, 101), timecodes)
+        with self.assertRaisesRegex(ValueError, "bounds"):
+            acsuite.frames_to_timecodes((-101, 10), timecodes)
+
+        with self.assertRaisesRegex(TypeError, "list of tuples"):
+            acsuite.frames_to_timecodes("str", timecodes)
+        with self.assertRaisesRegex(TypeError, "not a tuple"):
+            acsuite.frames_to_timecodes([(1, 2), "str"], timecodes)
+        with self.assertRaisesRegex(ValueError, "2 elements"):
+            acsuite.frames_to_timecodes([(1, 2), (1, 2, 3)], timecodes)
+        with self.assertRaisesRegex(TypeError, "only ints"):
+            acsuite.frames_to_timecodes([(1, 2), (1, "str")], timecodes)
+
+        with self.assertLogs(acsuite.logger, "WARNING"):
+            acsuite.frames_to_timecodes([(0, 5), (8, 9), (4, 10)], timecodes)
+        with self.assertLogs(acsuite.logger, "WARNING"):
+            acsuite.frames_to_timecodes([(0, 10), (20, 30), (5, 8)], timecodes)
+
+    def test_pyav_recut(self):
+        try:
+            import av
+        except ImportError:
+            self.skipTest("PyAV is not installed")
+        from acsuite import pyav
+
+        # 4 seconds of 48 kHz FLAC, the encoder writes 96 ms packets
+        with av.open("_acsuite_test_pyav.mka", "w") as container:
+            stream = container.add_stream("flac", rate=48000, layout="mono")
+            for i in range(42):
+                frame = av.AudioFrame(format="s16", layout="mono", samples=4608)
+                frame.planes[0].update(bytes(2 * 4608))
+                frame.rate, frame.pts = 48000, i * 4608
+                container.mux(stream.encode(frame))
+            container.mux(stream.encode(None))
+        try:
+            for ranges in ([(0.5, 1.0), (2.0, 2.5)], [(2.0, 2.5), (0.5, 1.0)]):
+                outputs = pyav.recut("_acsuite_test_pyav.mka", ranges, outfile="_acsuite_test_pyav_out.mka")
+                self.assertEqual(outputs, ["_acsuite_test_pyav_out.mka"])
+                with av.open(outputs[0]) as container:
+                    packets = [(p.pts * p.time_base, p.duration * p.time_base)
+                               for p in container.demux() if p.pts is not None]
+                self.assertEqual(packets[0][0], 0)
+                # whole packets around every cut, at most one extra at each end of a range
+                self.assertTrue(1.0 <= sum(d for _, d in packets) <= 1.0 + 4 * 0.096)
+                for (pts, duration), (next_pts, _) in zip(packets, packets[1:]):
+                    self.assertEqual(pts + duration, next_pts)
+        finally:
+            for f in ("_acsuite_test_pyav.mka", "_acsuite_test_pyav_out.mka"):
+                if os.path.isfile(f):
+                    os.remove(f)
+
+    def test_recut_commands(self):
+        S = acsuite.AudioStream
+        lossy = [S(self.AAC, None, 1, "default"), S(self.AAC, None, 2, "0")]
+        lossless = [S(self.FLAC, 16, 1, "default"), S(self.TRUEHD, 24, 2, "0")]
+        ranges = [(1.0, 2.0), (3.0, 4.5)]
+        clips = (["-i", "_acsuite_test.mka"]
+                 + ["-ss", "1.000000000", "-to", "2.000000000", "-map", "0:1", "-map", "0:2"]
+                 + ["-c:a:0", "copy", "-c:a:1", "copy", "<temp0>"]
+                 + ["-ss", "3.000000000", "-to", "4.500000000", "-map", "0:1", "-map", "0:2"]
+                 + ["-c:a:0", "copy", "-c:a:1", "copy", "<temp1>", "-y"])
+        concat = ["-f", "concat", "-safe", "0", "-protocol_whitelist", "file,pipe", "-i", "pipe:0"]
+        listing = "file 'file:<temp0>'\nfile 'file:<temp1>'\n"
+
+        # codec copy, every range clipped by one ffmpeg run and joined by concat
+        self.assertEqual(self.recut_commands(lossy, ranges), [
+            (clips, None),
+            (concat + ["-map", "0:0", "-map", "0:1", "-c:a:0", "copy", "-c:a:1", "copy", "<temp2>", "-y"], listing),
+        ])
+        # codec options are repeated for every output file
+        self.assertEqual(self.recut_commands(lossy, ranges, False, "_acsuite_test_out_{index}.mka"), [
+            (clips, None),
+            (concat + ["-map", "0:0", "-c:a:0", "copy", "<temp2>", "-map", "0:1", "-c:a:0", "copy", "<temp3>", "-y"],
+             listing),
+        ])
+        # a single range is clipped straight to the output
+        self.assertEqual(self.recut_commands(lossy, ranges[:1]), [
+            (["-i", "_acsuite_test.mka", "-ss", "1.000000000", "-to", "2.000000000", "-map", "0:1", "-map", "0:2",
+              "-c:a:0", "copy", "-c:a:1", "copy", "<temp0>", "-y"], None),
+        ])
+        # ffmpeg resets output options for every output file, so each one is clipped
+        self.assertEqual(self.recut_commands(lossy, ranges[:1], False, "_acsuite_test_out_{index}.mka"), [
+            (["-i", "_acsuite_test.mka",
+              "-ss", "1.000000000", "-to", "2.000000000", "-map", "0:1", "-c:a:0", "copy", "<temp0>",
+              "-ss", "1.000000000", "-to", "2.000000000", "-map", "0:2", "-c:a:0", "copy", "<temp1>", "-y"], None),
+        ])
+
+        # lossless and decode-only streams are trimmed and joined in one filtergraph
+        graph = ";".join(
+            f"[0:{s}]asplit=2[s{i}_0][s{i}_1];"
+            f"[s{i}_0]atrim=start=1.000000000:end=2.000000000,asetpts=PTS-STARTPTS[t{i}_0];"
+            f"[s{i}_1]atrim=start=3.000000000:end=4.500000000,asetpts=PTS-STARTPTS[t{i}_1];"
+            f"[t{i}_0][t{i}_1]concat=n=2:v=0:a=1[a{i}]" for i, s in enumerate((1, 2)))
+        flac = ["-c:a:0", "flac", "-map_metadata:s:a:0", "0:s:1", "-disposition:a:0", "default"]
+        self.assertEqual(self.recut_commands(lossless, ranges), [
+            (["-i", "_acsuite_test.mka", "-filter_complex_script", "pipe:0", "-map_chapters", "-1",
+              "-map", "[a0]", "-map", "[a1]", *flac,
+              "-c:a:1", "pcm_s24le", "-map_metadata:s:a:1", "0:s:2", "-disposition:a:1", "0", "<temp0>", "-y"], graph),
+        ])
+        self.assertEqual(self.recut_commands(lossless, ranges, False, "_acsuite_test_out_{index}.mka"), [
+            (["-i", "_acsuite_test.mka", "-filter_complex_script", "pipe:0", "-map_chapters", "-1",
+              "-map", "[a0]", *flac, "<temp0>",
+              "-map", "[a1]", "-c:a:0", "pcm_s24le", "-map_metadata:s:a:0", "0:s:2", "-disposition:a:0", "0",
+              "<temp1>", "-y"], graph),
+        ])
+        # unless the ranges go backwards, then decoded clips are joined instead
+        self.assertEqual(self.recut_commands(lossless[1:], ranges[::-1]), [
+            (["-i", "_acsuite_test.mka", "-ss", "3.000000000", "-to", "4.500000000", "-map", "0:2",
+              "-c:a:0", "pcm_s24le", "<temp0>", "-ss", "1.000000000", "-to", "2.000000000", "-map", "0:2",
+              "-c:a:0", "pcm_s24le", "<temp1>", "-y"], None),
+            (concat + ["-map", "0:0", "-c:a:0", "copy", "<temp2>", "-y"], listing),
+        ])
+        # any lossy stream puts all of them on the codec copy path
+        self.assertEqual(self.recut_commands([lossless[0], lossy[1]], ranges)[0], (clips, None))
+
+        # long range lists are clipped in several runs, each short enough for any command line
+        many = [(float(k), k + 0.5) for k in range(600)]
+        *runs, (_, listing) = self.recut_commands(lossy, many)
+        self.assertGreater(len(runs), 1)
+        self.assertTrue(all(len(" ".join(args)) < acsuite.ffmpeg.MAX_COMMAND_LENGTH for args, _ in runs))
+        self.assertEqual(listing, "".join(f"file 'file:<temp{k}>'\n" for k in range(600)))
+
+    def recut_commands(self, streams, ranges, combine=True, outfile="_acsuite_test_out.mka"):
+        """Run ``FFmpegAudio.recut`` with ffmpeg stubbed out, return the args and stdin of every ffmpeg call."""
+        calls = []
+
+        def ffmpeg(*args, stdin=None):
+            calls.append((list(args), stdin))
+            # outputs have to exist to be moved into place
+            for prev, arg in zip(("",) + args, args):
+                if arg.endswith(".mka") and prev != "-i":
+                    open(arg, "w").close()
+            return []
+
+        ff = acsuite.FFmpegAudio.__new__(acsuite.FFmpegAudio)
+        ff.ffmpeg = ffmpeg
+        for name in ff.recut("_acsuite_test.mka", ranges, streams, outfile, combine):
+            os.remove(name)
+
+        # temporary paths are random, number them in order of appearance
+        temps = {}
+
+        def number(text):
+            return re.sub(r"[^\s':]*_acsuite_temp_[^\s']*",
+                          lambda m: temps.setdefault(m.group(0), f"<temp{len(temps)}>"), text)
+
+        return [([number(a) for a in args], stdin and number(stdin)) for args, stdin in calls]
+
     def test_eztrim(self):
         with self.assertRaisesRegex(FileNotFoundError, "not found"):
             acsuite.eztrim(self.BLANK_CLIP, (None, None), "non_existent_file.wav")